@@ -1,16 +1,30 @@
 import streamlit as st
 import sqlite3
-from datetime import datetime
+import hmac
 import random
-import re
+import threading
+import queue
+import itertools
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from secrets import randbelow
 
 # =========================
 # CONFIG
 # =========================
 DB_PATH = "angelito.db"
 
+# Conexiones de solo lectura: en WAL leen en paralelo mientras otra escribe
+READ_POOL_SIZE = 4
+
+# Checkpoint PASSIVE del WAL cada N escrituras para que el -wal no crezca
+CHECKPOINT_EVERY = 20
+
 # ⚠️ RECOMENDADO: en Streamlit Cloud define ADMIN_PASSWORD en Secrets
 # st.secrets["ADMIN_PASSWORD"]
+# Se lee en cada rerun (sin caché): st.secrets ya viene parseado, y así
+# cambiar la clave en Secrets surte efecto sin reiniciar el servidor
 ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD", "ADMIN2026")
 
 # =========================
@@ -40,110 +54,346 @@ PARTICIPANTS = [
 # =========================
 # HELPERS
 # =========================
-def clean_phone(x: str) -> str:
-    return re.sub(r"\D+", "", x or "")
+# Bytes ASCII que no son dígitos, para bytes.translate(None, ...).
+# Tamaño fijo (no depende de lo que escriba el usuario); cacheada para
+# no reconstruirla en cada rerun.
+@st.cache_resource
+def _ascii_non_digits():
+    return bytes(c for c in range(128) if not chr(c).isdecimal())
 
-def clean_pin(x: str) -> str:
-    return re.sub(r"\D+", "", x or "")
+_ASCII_NON_DIGITS = _ascii_non_digits()
 
-def now_iso() -> str:
-    return datetime.now().isoformat(timespec="seconds")
+def clean_phone(x: str) -> str:
+    if not x:
+        return ""
+    # Caso común: ya viene solo con dígitos, no hay nada que limpiar
+    if x.isdecimal():
+        return x
+    if x.isascii():
+        return x.encode("ascii").translate(None, _ASCII_NON_DIGITS).decode("ascii")
+    # Fuera de ASCII: mismo criterio que \d, sin guardar nada
+    return "".join(filter(str.isdecimal, x))
+
+# Misma limpieza para teléfono y PIN
+clean_pin = clean_phone
+
+# PIN con fuente criptográfica; el sorteo usa su propio generador aparte
+_rng = random.Random()
 
 def gen_pin_6() -> str:
-    return f"{random.randint(0, 999999):06d}"
-
-def valid_phones_set():
-    return set(phone for _, phone in PARTICIPANTS)
+    return f"{randbelow(1_000_000):06d}"
 
+# PARTICIPANTS no cambia: se construye una vez por proceso, no en cada rerun
+@st.cache_resource
 def phone_to_name_map():
     return {phone: name for name, phone in PARTICIPANTS}
 
+# Un solo escritor a la vez sobre la conexión compartida.
+# Cacheado como la conexión: el script se re-ejecuta en cada rerun y un
+# Lock() global sería uno nuevo por ejecución, sin excluir a nadie.
+@st.cache_resource
+def _write_lock():
+    return threading.Lock()
+
+_WRITE_LOCK = _write_lock()
+
+@st.cache_resource
+def _enable_wal(_conn):
+    """WAL queda guardado en el archivo: basta activarlo una vez por proceso."""
+    _conn.execute("PRAGMA journal_mode=WAL")
+
+def _open_conn(readonly: bool = False):
+    """Autocommit + WAL: los lectores no bloquean, las escrituras van con _WRITE_LOCK."""
+    if readonly:
+        target, uri = Path(DB_PATH).resolve().as_uri() + "?mode=ro", True
+    else:
+        target, uri = DB_PATH, False
+    conn = sqlite3.connect(
+        target,
+        uri=uri,
+        check_same_thread=False,
+        isolation_level=None,
+        cached_statements=256,
+    )
+    # En memoria no hay archivo: ni WAL ni mmap aplican
+    if DB_PATH != ":memory:":
+        if not readonly:
+            _enable_wal(conn)
+        conn.execute("PRAGMA mmap_size=268435456")
+    # Estos son por conexión
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")  # ~64 MB
+    conn.execute("PRAGMA busy_timeout=5000")  # espera en vez de SQLITE_BUSY entre sesiones
+    return conn
+
+@st.cache_resource
 def get_conn():
-    return sqlite3.connect(DB_PATH, check_same_thread=False)
+    """
+    Conexión de escritura única por proceso (se reutiliza entre reruns y sesiones).
+    Todo uso va dentro de _WRITE_LOCK: un hilo a la vez, seguro aun sin
+    SQLite "serialized" (sqlite3.threadsafety es 1 en Python <= 3.10).
+    """
+    return _open_conn()
+
+@st.cache_resource
+def _read_pool():
+    pool = queue.Queue()
+    for _ in range(READ_POOL_SIZE):
+        pool.put(_open_conn(readonly=True))
+    return pool
 
-def generate_derangement(items, max_tries=20000):
+@contextmanager
+def read_conn():
+    """
+    Presta una conexión de solo lectura del pool (un hilo a la vez por conexión).
+    Las escrituras siguen yendo por get_conn() + _WRITE_LOCK.
+    """
+    # Cada conexión :memory: es una base distinta: se lee de la misma que se
+    # escribe, con el mismo lock que la protege
+    if DB_PATH == ":memory:":
+        with _WRITE_LOCK:
+            yield get_conn()
+        return
+
+    pool = _read_pool()
+    conn = pool.get()
+    try:
+        yield conn
+    finally:
+        pool.put(conn)
+
+def generate_derangement(items):
     """
     Derangement: nadie se asigna a sí mismo.
     items: lista de teléfonos
     retorna dict[giver_phone] = receiver_phone
+
+    Algoritmo de Sattolo: una sola pasada que produce un ciclo único,
+    así que nunca hay puntos fijos y no hace falta reintentar.
     """
     items = [i for i in items if i]
     if len(items) < 2:
         raise ValueError("Necesitas al menos 2 participantes.")
 
-    for _ in range(max_tries):
-        shuffled = items[:]
-        random.shuffle(shuffled)
-        if all(a != b for a, b in zip(items, shuffled)):
-            return dict(zip(items, shuffled))
+    shuffled = items[:]
+    for i in range(len(shuffled) - 1, 0, -1):
+        j = _rng.randrange(i)  # j < i estrictamente
+        shuffled[i], shuffled[j] = shuffled[j], shuffled[i]
 
-    raise RuntimeError("No pude generar una asignación válida. Revisa la lista.")
+    return dict(zip(items, shuffled))
+
+def load_assignment_plan(phones):
+    """
+    Plan fijo opcional desde Secrets (no en el código: el repo es público).
+
+        [ASSIGNMENT_PLAN]
+        "8494248466" = "8296899377"
+        ...
+
+    Si no hay plan, se genera uno al azar con generate_derangement().
+    """
+    plan = st.secrets.get("ASSIGNMENT_PLAN")
+    if not plan:
+        return generate_derangement(phones)
+
+    plan = {str(giver): str(receiver) for giver, receiver in dict(plan).items()}
+    expected = set(phones)
+    if set(plan) != expected or set(plan.values()) != expected:
+        raise ValueError("ASSIGNMENT_PLAN no cubre exactamente a los participantes.")
+    if any(giver == receiver for giver, receiver in plan.items()):
+        raise ValueError("ASSIGNMENT_PLAN asigna a alguien a sí mismo.")
+    return plan
+
+# =========================
+# SQL
+# =========================
+# Constantes a nivel de módulo: el mismo texto en cada llamada
+# reutiliza la sentencia ya preparada del caché de sqlite3.
+
+# Versión del esquema guardada en el archivo; si coincide, el esquema y la
+# siembra ya están hechos y init_db no necesita revisar columnas
+_SCHEMA_VERSION = 2
+
+_SQL_GET_VERSION = "PRAGMA user_version"
+
+_SQL_SET_VERSION = f"PRAGMA user_version = {_SCHEMA_VERSION}"
+
+_SQL_TABLE_INFO = "PRAGMA table_info(participants)"
+
+# Hora local ISO (mismo formato que datetime.now().isoformat(timespec="seconds")),
+# calculada por SQLite; RETURNING la devuelve a la UI
+_SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime')"
+
+_SQL_DROP = "DROP TABLE participants"
+
+_SQL_CREATE = """
+    CREATE TABLE IF NOT EXISTS participants (
+        phone TEXT PRIMARY KEY,
+        name TEXT NOT NULL,
+        pin TEXT,
+        assigned_to_phone TEXT NOT NULL,
+        assigned_to_name TEXT NOT NULL,
+        registered_at TEXT,
+        revealed_at TEXT
+    )
+"""
+
+_SQL_COUNT = "SELECT COUNT(*) FROM participants"
+
+_SQL_SEED = """
+    INSERT INTO participants (phone, name, pin, assigned_to_phone, assigned_to_name, registered_at, revealed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_ANALYZE = "ANALYZE"
+
+_SQL_OPTIMIZE = "PRAGMA optimize"
+
+_SQL_CHECKPOINT = "PRAGMA wal_checkpoint(PASSIVE)"
+
+_SQL_FETCH = """
+    SELECT phone, name, pin, assigned_to_phone, assigned_to_name, registered_at, revealed_at
+    FROM participants
+    WHERE phone = ?
+"""
+
+_SQL_REGISTER_UPDATE = f"""
+    UPDATE participants
+    SET
+        registered_at = {_SQL_NOW},
+        pin = COALESCE(pin, ?)
+    WHERE phone = ? AND registered_at IS NULL
+    RETURNING name, pin
+"""
+
+# Un solo texto para registro, validación y modo organizador: una sola sentencia preparada
+_SQL_PIN_ROW = "SELECT name, pin, registered_at FROM participants WHERE phone = ?"
+
+_SQL_REVEAL_UPDATE = f"""
+    UPDATE participants
+    SET revealed_at = COALESCE(revealed_at, {_SQL_NOW})
+    WHERE phone = ? AND registered_at IS NOT NULL
+    RETURNING assigned_to_name, revealed_at
+"""
+
+_SQL_STATS = "SELECT COUNT(*), COUNT(registered_at), COUNT(revealed_at) FROM participants"
+
+_SQL_RESET_PIN = "UPDATE participants SET pin = ? WHERE phone = ?"
+
+# Ya con la forma de la tabla del organizador (nombres y Sí/No)
+_SQL_ADMIN_OVERVIEW = """
+    SELECT
+        name AS "Nombre",
+        phone AS "Teléfono",
+        CASE WHEN registered_at IS NULL THEN 'No' ELSE 'Sí' END AS "Registrado",
+        CASE WHEN revealed_at IS NULL THEN 'No' ELSE 'Sí' END AS "Reveló",
+        assigned_to_name AS "Le regala a"
+    FROM participants
+    ORDER BY name
+"""
 
 # =========================
 # DB
 # =========================
-def init_db():
-    conn = get_conn()
-    cur = conn.cursor()
+def _create_and_seed(cur):
+    # Camino rápido: base ya creada y sembrada con este esquema
+    cur.execute(_SQL_GET_VERSION)
+    if cur.fetchone()[0] == _SCHEMA_VERSION:
+        return
 
     # Verifica si existe tabla y columnas
-    cur.execute("PRAGMA table_info(participants)")
+    cur.execute(_SQL_TABLE_INFO)
     cols = [r[1] for r in cur.fetchall()]  # column names
 
     # Si viene de estructura vieja, recrea
     required = {"phone", "name", "pin", "assigned_to_phone", "assigned_to_name", "registered_at", "revealed_at"}
     if cols and not required.issubset(set(cols)):
-        cur.execute("DROP TABLE participants")
-        conn.commit()
+        cur.execute(_SQL_DROP)
 
     # Crea tabla si no existe
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS participants (
-            phone TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            pin TEXT,
-            assigned_to_phone TEXT NOT NULL,
-            assigned_to_name TEXT NOT NULL,
-            registered_at TEXT,
-            revealed_at TEXT
-        )
-    """)
-    conn.commit()
+    cur.execute(_SQL_CREATE)
 
     # Si está vacía, sembrar
-    cur.execute("SELECT COUNT(*) FROM participants")
+    cur.execute(_SQL_COUNT)
     count = cur.fetchone()[0]
 
     if count == 0:
         phones = [phone for _, phone in PARTICIPANTS]
-        assignment = generate_derangement(phones)
+        assignment = load_assignment_plan(phones)
         p2n = phone_to_name_map()
 
-        rows = []
-        for giver_phone, receiver_phone in assignment.items():
-            rows.append(
-                (giver_phone, p2n[giver_phone], None, receiver_phone, p2n[receiver_phone], None, None)
-            )
+        # Generador: executemany consume las filas sin armar la lista completa
+        rows = (
+            (giver_phone, p2n[giver_phone], None, receiver_phone, p2n[receiver_phone], None, None)
+            for giver_phone, receiver_phone in assignment.items()
+        )
 
-        cur.executemany("""
-            INSERT INTO participants (phone, name, pin, assigned_to_phone, assigned_to_name, registered_at, revealed_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, rows)
-        conn.commit()
+        cur.executemany(_SQL_SEED, rows)
 
-    conn.close()
+        # Estadísticas frescas para el planificador tras la siembra
+        cur.execute(_SQL_ANALYZE)
 
-def fetch_by_phone(phone: str):
+    # En la misma transacción que la siembra: o quedan ambas o ninguna
+    cur.execute(_SQL_SET_VERSION)
+
+@st.cache_resource
+def init_db():
+    """
+    Crea y siembra la tabla; corre una sola vez por proceso (o tras borrar
+    el archivo, ver reopen_if_db_deleted), no en cada rerun.
+    """
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT phone, name, pin, assigned_to_phone, assigned_to_name, registered_at, revealed_at
-        FROM participants
-        WHERE phone = ?
-    """, (phone,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    with _WRITE_LOCK:
+        cur = conn.cursor()
+        # Un solo commit (un fsync) para esquema + siembra
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            _create_and_seed(cur)
+        except Exception:
+            cur.execute("ROLLBACK")
+            raise
+        cur.execute("COMMIT")
+        cur.execute(_SQL_OPTIMIZE)
+
+# Sube cada vez que se reinicia el sorteo; separa resultados guardados en sesión
+@st.cache_resource
+def _db_generation():
+    return {"n": 0}
+
+def reopen_if_db_deleted():
+    """
+    Reiniciar el sorteo = borrar angelito.db. Las conexiones cacheadas seguirían
+    escribiendo en el archivo borrado (y se perdería todo al reiniciar), así que
+    se descartan junto con init_db para que este rerun cree y siembre uno nuevo.
+    """
+    if DB_PATH == ":memory:" or os.path.exists(DB_PATH):
+        return
+
+    with _WRITE_LOCK:
+        # Otra sesión pudo haberlo recreado mientras esperábamos el lock
+        if os.path.exists(DB_PATH):
+            return
+        get_conn.clear()
+        _read_pool.clear()
+        _enable_wal.clear()
+        init_db.clear()
+        stats.clear()
+        _db_generation()["n"] += 1
+
+# Contador compartido entre reruns y sesiones (un global se reiniciaría en cada rerun)
+@st.cache_resource
+def _write_counter():
+    return itertools.count(1)
+
+def _after_write(conn):
+    """Llamar con _WRITE_LOCK tomado, tras cada escritura."""
+    if next(_write_counter()) % CHECKPOINT_EVERY == 0 and DB_PATH != ":memory:":
+        conn.execute(_SQL_CHECKPOINT)
+
+def fetch_by_phone(phone: str):
+    with read_conn() as conn:
+        return conn.execute(_SQL_FETCH, (phone,)).fetchone()
 
 def register_phone(phone: str):
     """
@@ -152,49 +402,42 @@ def register_phone(phone: str):
     - genera pin si es NULL
     Devuelve (name, pin, was_new)
     """
-    conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT name, pin, registered_at
-        FROM participants
-        WHERE phone = ?
-    """, (phone,))
-    row = cur.fetchone()
-
+    row = fetch_pin_row(phone)
     if not row:
-        conn.close()
         return None, None, False
 
     name, pin, registered_at = row
-    was_new = registered_at is None
 
-    # Si no tiene pin, se crea
-    if pin is None:
-        pin = gen_pin_6()
+    # Caso común (ya registrado): solo lectura, sin escribir ni generar PIN
+    if registered_at is not None:
+        return name, pin, False
 
-    cur.execute("""
-        UPDATE participants
-        SET
-            registered_at = COALESCE(registered_at, ?),
-            pin = COALESCE(pin, ?)
-        WHERE phone = ?
-    """, (now_iso(), pin, phone))
+    # PIN solo si no tiene; con None, COALESCE conserva el que ya hay
+    new_pin = gen_pin_6() if pin is None else None
 
-    conn.commit()
-    conn.close()
-    return name, pin, was_new
+    conn = get_conn()
+    with _WRITE_LOCK:
+        # Solo toca la fila si sigue sin registrar
+        row = conn.execute(_SQL_REGISTER_UPDATE, (new_pin, phone)).fetchone()
+        if row:
+            _after_write(conn)
+
+    if not row:
+        # Otra sesión lo registró entre la lectura y la escritura
+        name, pin, _ = fetch_pin_row(phone)
+        return name, pin, False
+
+    stats.clear()
+    name, pin = row
+    return name, pin, True
+
+def fetch_pin_row(phone: str):
+    """Devuelve (name, pin, registered_at) o None."""
+    with read_conn() as conn:
+        return conn.execute(_SQL_PIN_ROW, (phone,)).fetchone()
 
 def validate_phone_pin(phone: str, pin: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT name, pin, registered_at
-        FROM participants
-        WHERE phone = ?
-    """, (phone,))
-    row = cur.fetchone()
-    conn.close()
+    row = fetch_pin_row(phone)
 
     if not row:
         return False, None, None
@@ -206,96 +449,67 @@ def validate_phone_pin(phone: str, pin: str):
         return False, name, "NOT_REGISTERED"
 
     # Pin debe coincidir
-    if db_pin is None or pin != db_pin:
+    # compare_digest: tiempo constante, no filtra cuántos dígitos coinciden
+    if db_pin is None or not hmac.compare_digest((pin or "").encode(), db_pin.encode()):
         return False, name, "BAD_PIN"
 
     return True, name, "OK"
 
 def reveal_assignment(phone: str):
+    """
+    Marca revelado (solo la primera vez) y devuelve (assigned_to_name, revealed_at).
+    (None, None) si el teléfono no existe o aún no se registró.
+    """
     conn = get_conn()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT assigned_to_name, revealed_at
-        FROM participants
-        WHERE phone = ?
-    """, (phone,))
-    row = cur.fetchone()
+    with _WRITE_LOCK:
+        row = conn.execute(_SQL_REVEAL_UPDATE, (phone,)).fetchone()
+        if row:
+            _after_write(conn)
 
     if not row:
-        conn.close()
         return None, None
 
+    stats.clear()
     assigned_to_name, revealed_at = row
-
-    if revealed_at is None:
-        ts = now_iso()
-        cur.execute("""
-            UPDATE participants
-            SET revealed_at = ?
-            WHERE phone = ? AND revealed_at IS NULL
-        """, (ts, phone))
-        conn.commit()
-        revealed_at = ts
-
-    conn.close()
     return assigned_to_name, revealed_at
 
+# Se recalcula cada pocos segundos; register/reveal lo invalidan al escribir
+@st.cache_data(ttl=5)
 def stats():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT COUNT(*) FROM participants")
-    total = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM participants WHERE registered_at IS NOT NULL")
-    registered = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM participants WHERE revealed_at IS NOT NULL")
-    revealed = cur.fetchone()[0]
-    conn.close()
+    # COUNT(col) ignora NULLs: las tres métricas en un solo recorrido
+    with read_conn() as conn:
+        total, registered, revealed = conn.execute(_SQL_STATS).fetchone()
     return total, registered, revealed
 
 # =========================
 # ADMIN FUNCTIONS
 # =========================
 def get_pin_by_phone(phone: str):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT name, pin, registered_at FROM participants WHERE phone = ?", (phone,))
-    row = cur.fetchone()
-    conn.close()
-    return row
+    return fetch_pin_row(phone)
 
 def reset_pin(phone: str):
     new_pin = gen_pin_6()
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE participants SET pin = ? WHERE phone = ?", (new_pin, phone))
-    conn.commit()
-    conn.close()
+    with _WRITE_LOCK:
+        conn.execute(_SQL_RESET_PIN, (new_pin, phone))
+        _after_write(conn)
     return new_pin
 
-def admin_overview_rows():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        SELECT
-            name,
-            phone,
-            registered_at,
-            revealed_at,
-            assigned_to_name
-        FROM participants
-        ORDER BY name
-    """)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+def admin_overview_table():
+    """
+    Devuelve la tabla por columnas: {columna: [valores...]}
+    (st.dataframe la toma directo, sin armar un dict por fila).
+    """
+    with read_conn() as conn:
+        cur = conn.execute(_SQL_ADMIN_OVERVIEW)
+        names = [d[0] for d in cur.description]
+        columns = list(zip(*cur.fetchall())) or [()] * len(names)
+    return dict(zip(names, columns))
 
 # =========================
-# UI
+# ESTILOS
 # =========================
-st.set_page_config(page_title="Angelito 🎁", page_icon="🎁", layout="centered")
-
-st.markdown("""
+_CSS = """
 <style>
 .stApp{
   background: linear-gradient(180deg, #0b1220 0%, #0e1a2f 60%, #0b1220 100%);
@@ -320,7 +534,8 @@ input{
   color: #ffffff !important;
   padding: 0.85rem 0.9rem !important;
 }
-div.stButton > button{
+div.stButton > button,
+div.stFormSubmitButton > button{
   width: 100%;
   padding: 0.95rem 1.2rem !important;
   border-radius: 18px !important;
@@ -331,15 +546,26 @@ div.stButton > button{
   font-weight: 800 !important;
   box-shadow: 0 12px 30px rgba(0,0,0,0.28);
 }
-div.stButton > button:hover{ filter: brightness(1.07); transform: translateY(-1px); }
-div.stButton > button:active{ transform: translateY(1px); filter: brightness(0.98); }
+div.stButton > button:hover,
+div.stFormSubmitButton > button:hover{ filter: brightness(1.07); transform: translateY(-1px); }
+div.stButton > button:active,
+div.stFormSubmitButton > button:active{ transform: translateY(1px); filter: brightness(0.98); }
 [data-testid="stMetricValue"]{ color: #ffffff !important; font-weight: 800 !important; }
 [data-testid="stMetricLabel"]{ color: rgba(255,255,255,0.75) !important; }
 hr{ border-color: rgba(255,255,255,0.14) !important; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# =========================
+# UI
+# =========================
+st.set_page_config(page_title="Angelito 🎁", page_icon="🎁", layout="centered")
+
+# El CSS se emite en cada rerun: Streamlit borra los elementos que no se vuelven a dibujar
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # init
+reopen_if_db_deleted()
 init_db()
 
 st.title("Angelito Los Lola 🎁")
@@ -363,20 +589,17 @@ with st.form("registro"):
 
 if submit:
     phone = clean_phone(phone_input)
-    if phone not in valid_phones_set():
+    # La base es la fuente de verdad: sin fila, no es participante
+    name, pin, was_new = register_phone(phone)
+    if name is None:
         st.error("Ese teléfono no está en la lista de participantes.")
+    elif was_new:
+        st.success(f"Listo, **{name}**. Quedaste registrado/a ✅")
+        st.info(f"🔐 Tu PIN es: **{pin}**  (Guárdalo. Lo necesitarás para revelar.)")
+        st.warning("Este PIN se muestra aquí SOLO una vez para que lo copies. Si lo pierdes, pídeselo al organizador.")
     else:
-        name, pin, was_new = register_phone(phone)
-        if name is None:
-            st.error("No pude encontrarte en la base (no debería pasar).")
-        else:
-            if was_new:
-                st.success(f"Listo, **{name}**. Quedaste registrado/a ✅")
-                st.info(f"🔐 Tu PIN es: **{pin}**  (Guárdalo. Lo necesitarás para revelar.)")
-                st.warning("Este PIN se muestra aquí SOLO una vez para que lo copies. Si lo pierdes, pídeselo al organizador.")
-            else:
-                st.success(f"**{name}**, ya estabas registrado/a ✅")
-                st.info("Si no recuerdas tu PIN, pídeselo al organizador (no se vuelve a mostrar por seguridad).")
+        st.success(f"**{name}**, ya estabas registrado/a ✅")
+        st.info("Si no recuerdas tu PIN, pídeselo al organizador (no se vuelve a mostrar por seguridad).")
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -386,37 +609,40 @@ st.divider()
 st.markdown('<div class="card">', unsafe_allow_html=True)
 st.subheader("Revelar asignación (Teléfono + PIN)")
 
-phone_input2 = st.text_input("Teléfono:", placeholder="Ej: 8091234567")
-pin_input = st.text_input("PIN (6 dígitos):", placeholder="Ej: 123456", type="password")
-
-phone2 = clean_phone(phone_input2)
-pin2 = clean_pin(pin_input)
+# En un form: escribir no dispara reruns, solo el botón de enviar
+with st.form("revelar"):
+    phone_input2 = st.text_input("Teléfono:", placeholder="Ej: 8091234567")
+    pin_input = st.text_input("PIN (6 dígitos):", placeholder="Ej: 123456", type="password")
+    reveal_btn = st.form_submit_button("🎲 Revelar a quién me tocó", use_container_width=True)
 
-colA, colB = st.columns([1, 1])
-with colA:
-    reveal_btn = st.button("🎲 Revelar a quién me tocó", use_container_width=True)
-with colB:
-    refresh_btn = st.button("🔄 Actualizar", use_container_width=True)
+refresh_btn = st.button("🔄 Actualizar", use_container_width=True)
 
 if refresh_btn:
     st.rerun()
 
 if reveal_btn:
-    if phone2 not in valid_phones_set():
+    phone2 = clean_phone(phone_input2)
+    pin2 = clean_pin(pin_input)
+
+    ok, name, status = validate_phone_pin(phone2, pin2)
+
+    if name is None:
         st.error("Ese teléfono no está en la lista.")
+    elif status == "NOT_REGISTERED":
+        st.error("Debes registrarte primero antes de revelar tu asignación.")
+    elif status == "BAD_PIN":
+        st.error("PIN incorrecto. Verifica el PIN que te salió al registrarte.")
+    elif not ok:
+        st.error("No pude validar. Intenta de nuevo.")
     else:
-        ok, name, status = validate_phone_pin(phone2, pin2)
-
-        if status == "NOT_REGISTERED":
-            st.error("Debes registrarte primero antes de revelar tu asignación.")
-        elif status == "BAD_PIN":
-            st.error("PIN incorrecto. Verifica el PIN que te salió al registrarte.")
-        elif not ok:
-            st.error("No pude validar. Intenta de nuevo.")
-        else:
-            assigned_to_name, revealed_at = reveal_assignment(phone2)
-            st.success(f"✅ **{name}**, te tocó regalarle a: **{assigned_to_name}** 🎁")
-            st.caption(f"Revelado en: {revealed_at}")
+        # La asignación no cambia: tras la primera revelación en esta sesión
+        # se reutiliza el resultado y no se vuelve a escribir en la base
+        reveal_key = f"revealed_{_db_generation()['n']}_{phone2}"
+        if reveal_key not in st.session_state:
+            st.session_state[reveal_key] = reveal_assignment(phone2)
+        assigned_to_name, revealed_at = st.session_state[reveal_key]
+        st.success(f"✅ **{name}**, te tocó regalarle a: **{assigned_to_name}** 🎁")
+        st.caption(f"Revelado en: {revealed_at}")
 
 st.markdown('</div>', unsafe_allow_html=True)
 
@@ -424,15 +650,22 @@ st.divider()
 
 # ===== Modo organizador =====
 with st.expander("🔐 Modo organizador (solo para el organizador)"):
-    admin_pass = st.text_input("Clave del organizador", type="password")
-    is_admin = (admin_pass == ADMIN_PASSWORD)
+    with st.form("admin"):
+        admin_pass = st.text_input("Clave del organizador", type="password")
+        # Primer botón del form: Enter en la clave solo entra, sin pedir teléfono
+        st.form_submit_button("🔓 Entrar")
+
+        st.markdown("### Acciones")
+        phone_admin_input = st.text_input("Teléfono del participante (para PIN)")
 
-    st.markdown("### Acciones")
-    phone_admin = clean_phone(st.text_input("Teléfono del participante (para PIN)"))
+        col1, col2 = st.columns(2)
+        view_pin_btn = col1.form_submit_button("👁️ Ver PIN")
+        reset_pin_btn = col2.form_submit_button("♻️ Generar PIN nuevo")
 
-    col1, col2 = st.columns(2)
+    is_admin = (admin_pass == ADMIN_PASSWORD)
+    phone_admin = clean_phone(phone_admin_input)
 
-    if col1.button("👁️ Ver PIN"):
+    if view_pin_btn:
         if not is_admin:
             st.error("Clave incorrecta.")
         elif not phone_admin:
@@ -447,7 +680,7 @@ with st.expander("🔐 Modo organizador (solo para el organizador)"):
                     st.warning(f"**{name}** aún no se ha registrado.")
                 st.success(f"PIN de **{name}**: **{pin}**")
 
-    if col2.button("♻️ Generar PIN nuevo"):
+    if reset_pin_btn:
         if not is_admin:
             st.error("Clave incorrecta.")
         elif not phone_admin:
@@ -466,19 +699,10 @@ with st.expander("🔐 Modo organizador (solo para el organizador)"):
     st.markdown("### Estado del sorteo")
 
     if is_admin:
-        rows = admin_overview_rows()
+        table = admin_overview_table()
         # tabla simple sin pandas
         st.write("**Registrados / Revelados / Asignación (solo organizador):**")
-        st.dataframe(
-            [{
-                "Nombre": r[0],
-                "Teléfono": r[1],
-                "Registrado": "Sí" if r[2] else "No",
-                "Reveló": "Sí" if r[3] else "No",
-                "Le regala a": r[4],
-            } for r in rows],
-            use_container_width=True
-        )
+        st.dataframe(table, use_container_width=True)
     else:
         st.info("Introduce la clave correcta para ver el estado completo.")
 